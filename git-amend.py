@@ -4,7 +4,7 @@ import os
 import subprocess as sp
 from git import Repo
 import time
-from shared.utils import get_heads_at, get_child_heads, safeget_head
+from shared.utils import get_heads_at, get_child_heads, safeget_head, RefTransaction
 
 
 def parse_args():
@@ -59,16 +59,29 @@ def main():
 
     amend_commit = repo.head.commit
 
+    # All branch moves and creations are collected and applied together
+    transaction = RefTransaction(repo)
     if src_has_child_heads:
-        # Move the HEAD to a new temp branch
-        repo.head.reference = repo.create_head(amend_branch_name)
+        # Create a new temp branch for the HEAD
+        transaction.create_head(amend_branch_name, amend_commit)
     else:
         # If there were no child branches for the source commit, move any exact heads to the new commit
         # We do not need to create a temp branch for this
         src_heads = get_heads_at(repo, src_commit)
         for head in src_heads:
-            print("Updating {}".format(head.name))
-            head.reference = amend_commit
+            transaction.update_head(head, amend_commit)
+
+    for description in transaction.describe():
+        print(description)
+    try:
+        transaction.commit()
+    except RuntimeError as e:
+        print("Error: Updating branches failed, no branch was changed.\n{}".format(e))
+        exit(1)
+
+    if src_has_child_heads:
+        # Move the HEAD to the new temp branch. It already points to the amended commit.
+        repo.head.reference = repo.heads[amend_branch_name]
 
 
 if __name__ == "__main__":
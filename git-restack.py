@@ -1,15 +1,23 @@
 #!/usr/bin/env python
+import argparse
 import os
 import subprocess as sp
 from git import Repo
-from shared.utils import get_heads_at, get_child_heads, delete_head
+from shared.utils import get_heads_at, get_child_heads, RefTransaction
 import time
 import logging
 logging.basicConfig(level=logging.ERROR)
 
 AMEND_BRANCH_PREFIX = "amend-"
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="Git Restack")
+    parser.add_argument("-n", "--dry-run", action="store_true", help="List the planned branch updates without changing anything")
+    return parser.parse_args()
+
 def main():
+    args = parse_args()
+
     repo = Repo(os.getcwd())
 
     # Get current commit
@@ -45,11 +53,13 @@ def main():
 
     can_cleanup = True
 
+    # All branch moves and deletions are collected and applied together at the end
+    transaction = RefTransaction(repo)
+
     # Move any branches that were exactly on the source commit to the new commit
     src_heads = get_heads_at(repo, src_commit)
     for head in src_heads:
-        print("Updating {}".format(head.name))
-        head.reference = amended_commit
+        transaction.update_head(head, amended_commit)
 
     # Move any branches that have child commits to the source commit
     heads_to_restack = get_child_heads(repo, src_commit)
@@ -58,17 +68,32 @@ def main():
         print("Error: Too many child branches found ({}). Restack only supports a single child branch.".format(len(heads_to_restack)))
     elif len(heads_to_restack) == 1:
         head = heads_to_restack[0]
-        print("Rebasing {} to amended commit {}".format(head.name, amended_shortsha))
-        repo.git.rebase(src_commit, head.name, onto=amended_commit)
-        # Verify if the moved branch is now on top of the amended commit
-        if amended_commit not in repo.merge_base(amended_commit, head.commit):
-            can_cleanup = False
-            print("Error: Rebasing {} failed. Please attempt another restack after rebasing has been solved.".format(head.name))
+        if args.dry_run:
+            print("Rebase {} to amended commit {}".format(head.name, amended_shortsha))
+        else:
+            print("Rebasing {} to amended commit {}".format(head.name, amended_shortsha))
+            repo.git.rebase(src_commit, head.name, onto=amended_commit)
+            # Verify if the moved branch is now on top of the amended commit
+            if amended_commit not in repo.merge_base(amended_commit, head.commit):
+                can_cleanup = False
+                print("Error: Rebasing {} failed. Please attempt another restack after rebasing has been solved.".format(head.name))
 
     if can_cleanup:
         # Delete the temporary branch name
-        delete_head(repo, amend_head)
-    else:
+        transaction.delete_head(amend_head)
+
+    for description in transaction.describe():
+        print(description)
+    if args.dry_run:
+        exit(0)
+
+    try:
+        transaction.commit()
+    except RuntimeError as e:
+        print("Error: Updating branches failed, no branch was changed.\n{}".format(e))
+        exit(1)
+
+    if not can_cleanup:
         print("Restack did not finish successfully. Please run restack again after fixing the errors.")
         exit(1)
 
@@ -7,11 +7,15 @@ import git
 from collections import defaultdict
 from colorama import Fore, Style
 from smartlog.smartlog import Smartlog
-from smartlog.printer import TreePrinter, NodePrinter, RefList
+from smartlog.printer import TreePrinter, NodePrinter, RefList, DiffPrinter
+from smartlog.prefetch import CommitPrefetcher
+from smartlog.snapshot import TreeSnapshot, TreeDiff, snapshot_path
 
 def parse_args():
     parser = argparse.ArgumentParser(description="Git Smartlog")
     parser.add_argument("-a", "--all", action="store_true", help="Display all commits, regardless of age")
+    parser.add_argument("-d", "--diff", action="store_true", help="Only display what changed in the tree since the last smartlog run")
+    parser.add_argument("-p", "--prefetch", action="store_true", help="Load commit details on a background thread while the tree is being built")
     return parser.parse_args()
 
 def main():
@@ -37,19 +41,34 @@ def main():
         print("Error: Unable to find origin/master branch")
         exit(-1)
 
-    smartlog = Smartlog(repo, main_ref, max_age=max_age)
+    if args.diff:
+        snapshot = TreeSnapshot.load(snapshot_path(repo))
+        if snapshot is not None and snapshot.main_name == main_ref.name:
+            tree_diff = TreeDiff(repo, snapshot, main_ref)
+            DiffPrinter(repo, tree_diff).print_diff()
+            tree_diff.snapshot.save(snapshot_path(repo))
+            print("Finished in {0:.3f}s".format(time.time() - start_time))
+            return
+        print("No previous smartlog snapshot found. Displaying the full tree.")
 
-    # Add all local branches
-    for ref in repo.heads:
-        smartlog.add_commit(ref.commit)
+    prefetcher = CommitPrefetcher(repo) if args.prefetch else None
 
-    # Add current head commit
-    smartlog.add_commit(repo.head.commit)
+    try:
+        smartlog = Smartlog(repo, main_ref, max_age=max_age, prefetcher=prefetcher)
+
+        # Add all local branches and the current head commit
+        smartlog.add_commits([ref.commit for ref in repo.heads] + [repo.head.commit])
+
+        reflist = RefList(repo, extra_refs=[main_ref])
+        node_printer = NodePrinter(repo, reflist, prefetcher=prefetcher)
+        printer = TreePrinter(repo, smartlog.root_node, main_ref, node_printer)
+        printer.print_tree()
 
-    reflist = RefList(repo, extra_refs=[main_ref])
-    node_printer = NodePrinter(repo, reflist)
-    printer = TreePrinter(repo, smartlog.root_node, main_ref, node_printer)
-    printer.print_tree()
+        # Store the tree so that the next run can display only what changed
+        TreeSnapshot.from_smartlog(smartlog).save(snapshot_path(repo))
+    finally:
+        if prefetcher is not None:
+            prefetcher.close()
 
     print("Finished in {0:.3f}s".format(time.time() - start_time))
 
@@ -1,12 +1,16 @@
+import tempfile
+
 def get_child_heads(repo, commit):
     """
     Returns a list of heads(branches) that will need to be restacked for a given commit.
     Will ignore any heads that are pointing to the commit given.
     Returns empty list of none are found
     """
+    # A single for-each-ref call finds every head containing the commit, instead of a merge-base per head
+    paths = set(repo.git.for_each_ref("refs/heads", contains=commit.hexsha, format="%(refname)").splitlines())
     found = []
     for head in repo.heads:
-            if head.commit != commit and commit in repo.merge_base(commit, head.commit):
+            if head.commit != commit and head.path in paths:
                 found.append(head)
     return found
 
@@ -21,15 +25,6 @@ def get_heads_at(repo, commit):
                 found.append(head)
     return found
 
-def delete_head(repo, head):
-    """
-    Deletes a specified head pointer.
-    If git's HEAD was pointing to this, move HEAD to the commit
-    """
-    if repo.head.commit == head.commit:
-        repo.head.reference = head.commit
-    repo.delete_head(head, force=True)
-
 def safeget_head(repo, name):
     """
     Returns a Head object if found. Returns None otherwise
@@ -38,3 +33,73 @@ def safeget_head(repo, name):
         return repo.heads[name]
     except IndexError:
         return None
+
+
+class RefTransaction:
+    """
+    Collects ref updates, creations and deletions and applies them all at once
+    with a single `git update-ref --stdin` call. Either every update is applied or none are.
+    Old values are recorded when an update is planned, so the transaction fails if a ref was moved in the meantime.
+    """
+    def __init__(self, repo):
+        if repo is None:
+            raise ValueError("Repo must not be None")
+        self.repo = repo
+        self.commands = []
+        self.descriptions = []
+        self.deleted_paths = []
+
+    def update_head(self, head, commit):
+        """
+        Moves an existing head to a commit
+        """
+        self.commands.append("update {} {} {}".format(head.path, commit.hexsha, head.commit.hexsha))
+        self.descriptions.append(("Update {} to {}", head.name, commit.hexsha))
+
+    def create_head(self, name, commit):
+        """
+        Creates a new head pointing to a commit. Fails if a head with that name already exists
+        """
+        self.commands.append("create refs/heads/{} {}".format(name, commit.hexsha))
+        self.descriptions.append(("Create {} at {}", name, commit.hexsha))
+
+    def delete_head(self, head):
+        """
+        Deletes a head. If git's HEAD is attached to it when the transaction is applied, HEAD is detached first
+        """
+        self.commands.append("delete {} {}".format(head.path, head.commit.hexsha))
+        self.descriptions.append(("Delete {}", head.name, None))
+        self.deleted_paths.append(head.path)
+
+    def describe(self):
+        """
+        Returns a list of human readable descriptions of the planned updates.
+        The short shas of all target commits are resolved with a single git call
+        """
+        shas = sorted(set(sha for _, _, sha in self.descriptions if sha is not None))
+        short_shas = {}
+        if len(shas) > 0:
+            short_shas = dict(line.split() for line in self.repo.git.log(*shas, no_walk=True, format="%H %h").splitlines())
+        return [template.format(name, short_shas.get(sha)) for template, name, sha in self.descriptions]
+
+    def commit(self):
+        """
+        Applies all planned updates atomically. Raises a RuntimeError with git's error message if any of them fails
+        """
+        if len(self.commands) == 0:
+            return
+
+        # update-ref refuses to update HEAD and the branch it points to in the same transaction,
+        # so HEAD is detached beforehand. This does not move any branch and is harmless if the transaction fails.
+        if not self.repo.head.is_detached and self.repo.head.ref.path in self.deleted_paths:
+            self.repo.head.reference = self.repo.head.commit
+
+        with tempfile.TemporaryFile() as f:
+            f.write(("\n".join(self.commands) + "\n").encode("utf-8"))
+            f.seek(0)
+            status, _, stderr = self.repo.git.update_ref("--stdin", istream=f, with_extended_output=True, with_exceptions=False)
+        if status != 0:
+            raise RuntimeError(stderr.strip())
+        self.commands = []
+        self.descriptions = []
+        self.deleted_paths = []
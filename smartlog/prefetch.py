@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+import logging
+import threading
+from queue import Queue
+from git import Repo
+
+class CommitInfo:
+    """
+    This class holds the commit details needed to print a node.
+    It is a plain snapshot so it can be handed over between threads safely.
+    """
+    def __init__(self, commit, short_sha):
+        self.hexsha = commit.hexsha
+        self.short_sha = short_sha
+        self.author_email = commit.author.email
+        self.committed_date = commit.committed_date
+        self.message = commit.message
+        self.summary = commit.summary
+
+    @classmethod
+    def load(cls, repo, commit):
+        """
+        Loads the details for a single commit on the calling thread
+        """
+        return cls(commit, repo.git.rev_parse(commit.hexsha, short=True))
+
+
+FLUSH = object()
+
+def load_short_shas(repo, shas):
+    """
+    Returns a map from sha to short sha for a list of commits.
+    A single log call resolves all of them (rev-parse --short only takes one revision)
+    """
+    if len(shas) == 0:
+        return {}
+    return dict(line.split() for line in repo.git.log(*shas, no_walk=True, format="%H %h").splitlines())
+
+
+def load_commit_infos(repo, shas):
+    """
+    Loads the details of a list of commits and returns them as a map from sha to CommitInfo
+    """
+    short_shas = load_short_shas(repo, shas)
+    return {sha: CommitInfo(repo.commit(sha), short_shas[sha]) for sha in shas}
+
+
+class CommitPrefetcher:
+    """
+    This class loads commit details on a background thread.
+    Shas are queued as soon as their nodes are created, and the worker reads their commit objects while the tree
+    is still being constructed. The short shas need a git process, so they are resolved in one batch when `flush`
+    is called, typically once the tree is complete. The worker owns a separate Repo instance, which means it streams
+    objects through its own cat-file process and never shares a git process with the main thread.
+    """
+    def __init__(self, repo):
+        if repo is None:
+            raise ValueError("Repo must not be None")
+        self.repo = repo
+        self.queue = Queue()
+        self.condition = threading.Condition()
+        self.queued = set()
+        self.unflushed = False
+        self.infos = {}
+        self.failed = False
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def add(self, sha):
+        """
+        Queues a commit sha for fetching. Shas already queued or loaded are ignored.
+        """
+        with self.condition:
+            if sha in self.queued:
+                return
+            self.queued.add(sha)
+            self.unflushed = True
+        self.queue.put(sha)
+
+    def flush(self):
+        """
+        Asks the worker to publish the details of every commit queued so far, resolving their short shas in one batch
+        """
+        with self.condition:
+            if not self.unflushed:
+                return
+            self.unflushed = False
+        self.queue.put(FLUSH)
+
+    def get(self, commit):
+        """
+        Returns the CommitInfo for a commit, waiting for the worker if it has not been loaded yet.
+        Returns None if the worker failed, so callers can fall back to a direct lookup.
+        """
+        if commit is None:
+            return None
+        self.add(commit.hexsha)
+        self.flush()
+        with self.condition:
+            while commit.hexsha not in self.infos and not self.failed:
+                self.condition.wait()
+            return self.infos.get(commit.hexsha)
+
+    def close(self):
+        """
+        Stops the worker thread once all queued shas have been processed
+        """
+        self.queue.put(None)
+        self.thread.join()
+
+    def run(self):
+        repo = None
+        try:
+            repo = Repo(self.repo.git_dir)
+            commits = {}
+            while True:
+                item = self.queue.get()
+                if item is FLUSH or item is None:
+                    short_shas = load_short_shas(repo, list(commits))
+                    infos = {sha: CommitInfo(commit, short_shas[sha]) for sha, commit in commits.items()}
+                    commits = {}
+                    with self.condition:
+                        self.infos.update(infos)
+                        self.condition.notify_all()
+                    if item is None:
+                        break
+                else:
+                    # Reading the message loads the whole commit object through the worker's cat-file process
+                    commit = repo.commit(item)
+                    commit.message
+                    commits[item] = commit
+        except Exception:
+            logging.exception("Prefetching commit details failed, falling back to direct lookups")
+            with self.condition:
+                self.failed = True
+                self.condition.notify_all()
+        finally:
+            if repo is not None:
+                repo.close()
@@ -1,6 +1,7 @@
 #!/usr/bin/env python3
 from git import Repo
-from smartlog import Node
+from smartlog.smartlog import Node
+from smartlog.prefetch import CommitInfo, load_commit_infos
 from collections import defaultdict
 from colorama import Fore, Style
 from datetime import datetime
@@ -19,8 +20,22 @@ class TreePrinter:
         self.node_printer = node_printer
 
     def print_tree(self):
+        self.node_printer.load(self.tree_commits())
         self.print_node(self.root_node, prefix="")
 
+    def tree_commits(self):
+        """
+        Returns the commits of all nodes in the tree
+        """
+        commits = []
+        pending = [self.root_node]
+        while len(pending) > 0:
+            node = pending.pop()
+            pending.extend(node.children)
+            if node.commit is not None:
+                commits.append(node.commit)
+        return commits
+
     def print_node(self, node, prefix):
         main_graph_connector = ""
         for i, child in enumerate(self.sorted_children(node)):
@@ -90,6 +105,75 @@ class TreePrinter:
 
 
 
+class DiffPrinter:
+    """
+    This class prints the structural changes computed by a TreeDiff.
+    It is the compact alternative to printing the whole tree after a fetch.
+    """
+    def __init__(self, repo, tree_diff):
+        if repo is None:
+            raise ValueError("Repo must not be None")
+        if tree_diff is None:
+            raise ValueError("Tree diff must not be None")
+
+        self.repo = repo
+        self.tree_diff = tree_diff
+        self.short_shas = {}
+
+    def print_diff(self):
+        diff = self.tree_diff
+        if diff.is_empty():
+            print("No changes since the last smartlog run")
+            return
+
+        self.load_short_shas()
+
+        if diff.main_moved():
+            print("{} moved {} -> {}".format(diff.main_name, self.short(diff.old_main_sha), self.short(diff.new_main_sha)))
+        if diff.rewritten:
+            print(Fore.RED + "The history of {} was rewritten".format(diff.main_name) + Fore.RESET)
+
+        for name in diff.landed_branches:
+            print(Fore.GREEN + "Landed: " + Fore.RESET + name)
+        if len(diff.landed_commits) > 0:
+            print(Fore.GREEN + "Landed commits: " + Fore.RESET + ", ".join(self.short(sha) for sha in diff.landed_commits))
+
+        for name in diff.added_branches:
+            print(Fore.YELLOW + "New: " + Fore.RESET + "{} ({})".format(name, self.short(diff.snapshot.refs[name])))
+        for name, old_sha, new_sha in diff.moved_branches:
+            print(Fore.YELLOW + "Moved: " + Fore.RESET + "{} {} -> {}".format(name, self.short(old_sha), self.short(new_sha)))
+        for name in diff.deleted_branches:
+            print(Fore.YELLOW + "Deleted: " + Fore.RESET + name)
+
+        for name, base in sorted(diff.new_bases.items()):
+            print(Fore.BLUE + "New merge base: " + Fore.RESET + "{} on {}".format(name, self.short(base)))
+
+        # Any branch with local commits that is not based on the tip of the main ref needs a rebase
+        needs_rebase = [name for name, base in sorted(diff.snapshot.bases.items())
+            if base != diff.new_main_sha and base != diff.snapshot.refs[name]]
+        if diff.main_moved() and len(needs_rebase) > 0:
+            print(Fore.MAGENTA + "Needs rebase onto {}: ".format(diff.main_name) + Fore.RESET + ", ".join(needs_rebase))
+
+    def load_short_shas(self):
+        """
+        Resolves the short shas of every commit we print with a single git call.
+        Commits that no longer exist (e.g. the old position of a rebased branch) are skipped
+        """
+        diff = self.tree_diff
+        shas = set([diff.old_main_sha, diff.new_main_sha])
+        shas.update(diff.landed_commits)
+        shas.update(diff.snapshot.refs[name] for name in diff.added_branches)
+        shas.update(diff.new_bases.values())
+        for _, old_sha, new_sha in diff.moved_branches:
+            shas.update([old_sha, new_sha])
+
+        lines = self.repo.git.log(*sorted(shas), no_walk=True, ignore_missing=True, format="%H %h").splitlines()
+        self.short_shas = dict(line.split() for line in lines)
+
+    def short(self, sha):
+        return self.short_shas.get(sha, sha[:7])
+
+
 class RefList:
     """
     This class can quickly map from a commit sha to a list of branch names (heads).
@@ -124,10 +208,20 @@ class RefList:
 
 
 class NodePrinter:
-    def __init__(self, repo, reflist):
+    def __init__(self, repo, reflist, prefetcher=None):
         self.repo = repo
         self.reflist = reflist
+        self.prefetcher = prefetcher
+        self.infos = {}
 
+    def load(self, commits):
+        """
+        Loads the details of all commits that will be printed in one batch.
+        Nothing is needed when a prefetcher is already loading them in the background
+        """
+        if self.prefetcher is not None:
+            return
+        self.infos.update(load_commit_infos(self.repo, [c.hexsha for c in commits]))
 
     def node_summary(self, node):
         """
@@ -140,19 +234,20 @@ class NodePrinter:
             return []
 
         lines = []
+        info = self.commit_info(node.commit)
 
         # Format the first line and start with the short sha
         line = ""
-        sha = node.repo.git.rev_parse(node.commit.hexsha, short=True)
+        sha = info.short_sha
         is_head = (self.repo.head.commit == node.commit) if node.commit is not None else False
         line += (Fore.MAGENTA if is_head else Fore.YELLOW) + sha + "  " + Fore.RESET
 
         # Add the author
-        author = node.commit.author.email.rsplit("@")[0]
+        author = info.author_email.rsplit("@")[0]
         line += author + "  "
 
         # Add any diffs
-        diff = self.differential_revision(node.commit)
+        diff = self.differential_revision(info.message)
         if diff is not None:
             line += Fore.BLUE + diff + "  " + Fore.RESET
 
@@ -163,22 +258,34 @@ class NodePrinter:
                 line += Fore.GREEN + "(" + ", ".join(refs) + ")  " + Fore.RESET
 
         # Add the commit date as a relative string
-        line += self.format_commit_date(node.commit.committed_date) + "  "
+        line += self.format_commit_date(info.committed_date) + "  "
 
         lines.append(line)
 
         # Format the second line
-        lines.append(node.commit.summary)
+        lines.append(info.summary)
 
         return lines
 
 
-    def differential_revision(self, commit):
-        if commit is None:
+    def commit_info(self, commit):
+        """
+        Returns the details for a commit, from the prefetcher if one is available
+        """
+        info = self.infos.get(commit.hexsha)
+        if info is None and self.prefetcher is not None:
+            info = self.prefetcher.get(commit)
+        if info is None:
+            info = CommitInfo.load(self.repo, commit)
+        return info
+
+
+    def differential_revision(self, message):
+        if message is None:
             return None
 
         diff_line_prefix = "Differential Revision:"
-        lines = commit.message.splitlines()
+        lines = message.splitlines()
         for l in lines:
             if l.startswith(diff_line_prefix):
                 l = l[len(diff_line_prefix):]
@@ -9,7 +9,7 @@ class Smartlog:
     Explicit commits are commits currently pointed to by a reference or local commits not on origin/master yet
     Implicit commits are common ancestors between the local branches and origin/master
     """
-    def __init__(self, repo, main_ref, max_age=None):
+    def __init__(self, repo, main_ref, max_age=None, prefetcher=None):
         if repo is None:
             raise ValueError("Repo must not be None")
         if main_ref is None:
@@ -18,7 +18,12 @@ class Smartlog:
         self.repo = repo
         self.commit_date_limit = time() - max_age if max_age else None
 
-        self.nodestore = NodeStore(repo)
+        self.nodestore = NodeStore(repo, prefetcher=prefetcher)
+
+        # Merge bases with the main ref and their position on the main ref's first parent chain
+        # (0 for the main ref, growing with age), precomputed in batch by add_commits
+        self.merge_bases = {}
+        self.main_positions = {}
 
         # Create a dummy node to store our tree
         self.root_node = Node(repo, None)
@@ -30,12 +35,28 @@ class Smartlog:
         self.main_node.is_main = True
         self.root_node.children.append(self.main_node)
 
+    def add_commits(self, commits):
+        """
+        Adds a list of commits to the tree.
+        The merge bases of all commits with the main ref are computed with a single git call up front,
+        so the number of git processes does not grow with the number of commits.
+        """
+        commits = [c for c in commits if c is not None and not self.is_too_old(c)]
+        self.load_merge_bases(commits)
+        self.load_main_positions()
+        for commit in commits:
+            self.add_commit(commit)
+
+        # The tree is complete, so the prefetcher can resolve all the commit details in one batch
+        if self.nodestore.prefetcher is not None:
+            self.nodestore.prefetcher.flush()
+
     def add_commit(self, commit):
         if commit is None:
             return
 
         # Do not add top level commits that are older than our max age
-        if self.commit_date_limit is not None and commit.committed_date < self.commit_date_limit:
+        if self.is_too_old(commit):
             return
 
         # Generate a node object to represent our commit
@@ -84,15 +105,78 @@ class Smartlog:
             if node.parent == self.root_node:
                 insert(lca_node, node, self.root_node)
                 break
+            elif self.is_ancestor(node.parent, lca_node):
+                insert(lca_node, node, node.parent)
+                break
             else:
-                base = self.get_merge_base(lca_node, node.parent)
-                if base == node.parent:
-                    insert(lca_node, node, node.parent)
-                    break
                 node = node.parent
 
+    def is_ancestor(self, ancestor_node, node):
+        """
+        Returns true if the commit of ancestor_node is an ancestor of the commit of node.
+        Uses the precomputed main ref positions when both are known, and a merge-base call otherwise
+        """
+        ancestor_position = self.main_positions.get(ancestor_node.commit.hexsha)
+        position = self.main_positions.get(node.commit.hexsha)
+        if ancestor_position is not None and position is not None:
+            return ancestor_position >= position
+        return self.get_merge_base(node, ancestor_node) == ancestor_node
+
+
+    def is_too_old(self, commit):
+        return self.commit_date_limit is not None and commit.committed_date < self.commit_date_limit
+
+    def load_merge_bases(self, commits):
+        """
+        Computes the merge bases of a list of commits with the main ref using a single rev-list call.
+        rev-list lists the local commits (not reachable from the main ref) with their parents. Walking down the
+        first parents of a commit, the first commit that is not local is its merge base.
+        """
+        if len(commits) == 0:
+            return
+        shas = [c.hexsha for c in commits]
+        out = self.repo.git.rev_list(*shas, "--not", self.main_ref.commit.hexsha, parents=True)
+        parents = {}
+        for line in out.splitlines():
+            line_shas = line.split()
+            parents[line_shas[0]] = line_shas[1] if len(line_shas) > 1 else None
+
+        for sha in shas:
+            base = sha
+            while base in parents:
+                base = parents[base]
+            if base is not None:
+                self.merge_bases[sha] = base
+
+    def load_main_positions(self):
+        """
+        Computes the position of the main ref and all known merge bases on the main ref's first parent chain.
+        One merge-base call finds the oldest of them, and one rev-list call lists the chain down to it, so the
+        ordering of the merge bases needs no git call per base. Merge bases that are not on the first parent
+        chain (e.g. reached through a merge) get no position.
+        """
+        main_sha = self.main_ref.commit.hexsha
+        bases = set(self.merge_bases.values())
+        bases.add(main_sha)
+        if len(bases) == 1:
+            self.main_positions[main_sha] = 0
+            return
+
+        oldest = self.repo.merge_base(*sorted(bases), octopus=True)
+        if len(oldest) != 1:
+            return
+        oldest_sha = oldest[0].hexsha
+        chain = self.repo.git.rev_list(main_sha, "--not", oldest_sha, first_parent=True).split()
+        chain.append(oldest_sha)
+
+        self.main_positions = {}
+        for position, sha in enumerate(chain):
+            if sha in bases:
+                self.main_positions[sha] = position
 
     def get_merge_base(self, node1, node2):
+        if node2 == self.main_node and node1.commit.hexsha in self.merge_bases:
+            return self.nodestore.get(self.repo.commit(self.merge_bases[node1.commit.hexsha]))
         b = self.repo.merge_base(node1.commit, node2.commit)
         return self.nodestore.get(b[0]) if len(b) == 1 else None
 
@@ -137,11 +221,13 @@ class NodeStore:
     """
     This class acts like a store for Node objects.
     It can return an already generated Node for a commit, or create a new one if needed.
+    If a prefetcher is given, every new node's commit is queued on it so its details load in the background.
     """
-    def __init__(self, repo):
+    def __init__(self, repo, prefetcher=None):
         if repo is None:
             raise ValueError("Repo must not be None")
         self.repo = repo
+        self.prefetcher = prefetcher
         self.map = {}
 
     def add(self, commit):
@@ -149,6 +235,8 @@ class NodeStore:
             return
         node = Node(self.repo, commit)
         self.map[commit.hexsha] = node
+        if self.prefetcher is not None:
+            self.prefetcher.add(commit.hexsha)
         return node
 
     def get(self, commit):
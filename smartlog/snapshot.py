@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+import json
+import os
+from git.exc import GitCommandError
+
+SNAPSHOT_FILE_NAME = "smartlog-snapshot.json"
+
+def snapshot_path(repo):
+    """
+    Returns the path of the file storing the last smartlog snapshot for a repo
+    """
+    return os.path.join(repo.git_dir, SNAPSHOT_FILE_NAME)
+
+
+class TreeSnapshot:
+    """
+    This class is a compact snapshot of a sparse tree that can be stored between runs.
+    It keeps:
+    - the main ref name and position
+    - the position of every local branch
+    - the merge base of every branch with the main ref
+    - the local (non main) nodes of the tree as a map from commit sha to parent sha
+    """
+    def __init__(self, main_name, main_sha, refs, bases, nodes):
+        self.main_name = main_name
+        self.main_sha = main_sha
+        self.refs = refs
+        self.bases = bases
+        self.nodes = nodes
+
+    @classmethod
+    def from_smartlog(cls, smartlog):
+        """
+        Generates a snapshot from an already constructed Smartlog tree
+        """
+        nodes = {}
+        main_shas = set()
+        pending = [smartlog.root_node]
+        while len(pending) > 0:
+            node = pending.pop()
+            pending.extend(node.children)
+            if node.commit is None:
+                continue
+            if node.is_main:
+                main_shas.add(node.commit.hexsha)
+            elif node.parent is not None and node.parent.commit is not None:
+                nodes[node.commit.hexsha] = node.parent.commit.hexsha
+
+        refs = {head.name: head.commit.hexsha for head in smartlog.repo.heads}
+
+        # Branches outside of the tree (e.g. older than the max age) do not get a merge base
+        bases = {}
+        for name, sha in refs.items():
+            if sha in nodes:
+                bases[name] = find_base(nodes, sha)
+            elif sha in main_shas:
+                bases[name] = sha
+
+        return cls(smartlog.main_ref.name, smartlog.main_ref.commit.hexsha, refs, bases, nodes)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Loads a snapshot from a file. Returns None if the file is missing or can't be read
+        """
+        try:
+            with open(path) as f:
+                data = json.load(f)
+            return cls(data["main_name"], data["main_sha"], data["refs"], data["bases"], data["nodes"])
+        except (IOError, ValueError, KeyError):
+            return None
+
+    def save(self, path):
+        data = {
+            "main_name": self.main_name,
+            "main_sha": self.main_sha,
+            "refs": self.refs,
+            "bases": self.bases,
+            "nodes": self.nodes,
+        }
+        with open(path, "w") as f:
+            json.dump(data, f, sort_keys=True)
+
+
+class TreeDiff:
+    """
+    This class computes the structural changes between a stored snapshot and the current repo state.
+    Only refs that changed are queried, so the number of git calls grows with the number of changes
+    and not with the size of the repository:
+    - 1 rev-list call to find the commits that landed on the main ref if it moved forward
+    - 2 calls (merge-base and rev-list) per branch that was created or moved
+    If the main ref was rewritten (not a fast forward), every branch is queried again, and the landed commits
+    are derived from the new merge bases.
+    At the end, `snapshot` holds the updated snapshot for the current state.
+    """
+    def __init__(self, repo, previous, main_ref):
+        if repo is None:
+            raise ValueError("Repo must not be None")
+        if previous is None:
+            raise ValueError("Previous snapshot must not be None")
+        if main_ref is None:
+            raise ValueError("Main ref must not be None")
+
+        self.repo = repo
+        self.previous = previous
+        self.main_name = main_ref.name
+        self.old_main_sha = previous.main_sha
+        self.new_main_sha = main_ref.commit.hexsha
+
+        self.rewritten = False
+        self.landed_commits = []
+        self.landed_branches = []
+        self.added_branches = []
+        self.moved_branches = []
+        self.deleted_branches = []
+        self.new_bases = {}
+
+        self.snapshot = self.compute()
+
+    def main_moved(self):
+        return self.old_main_sha != self.new_main_sha
+
+    def is_empty(self):
+        return (not self.main_moved() and
+            len(self.added_branches) == 0 and
+            len(self.moved_branches) == 0 and
+            len(self.deleted_branches) == 0)
+
+    def compute(self):
+        refs = {head.name: head.commit.hexsha for head in self.repo.heads}
+        nodes = dict(self.previous.nodes)
+        bases = {}
+
+        landed = set()
+        if self.main_moved():
+            try:
+                if self.repo.is_ancestor(self.old_main_sha, self.new_main_sha):
+                    revs = "{}..{}".format(self.old_main_sha, self.new_main_sha)
+                    landed = set(self.repo.git.rev_list(revs).split())
+                else:
+                    self.rewritten = True
+            except GitCommandError:
+                # The previous main commit is gone from the object database
+                self.rewritten = True
+
+        # When the main ref was rewritten, every branch is queried. A previous local commit that is now the merge
+        # base of its branch reached the main ref, together with everything below it in its stack
+        if self.rewritten:
+            for name, sha in refs.items():
+                old_sha = self.previous.refs.get(name)
+                if old_sha is not None and old_sha in self.previous.nodes:
+                    base = self.merge_base(sha)
+                    if base is not None:
+                        bases[name] = base
+                        landed.update(self.landed_below(old_sha, base))
+
+        for name, sha in sorted(refs.items()):
+            old_sha = self.previous.refs.get(name)
+            if old_sha is None:
+                self.added_branches.append(name)
+            elif old_sha != sha:
+                self.moved_branches.append((name, old_sha, sha))
+            elif not self.rewritten:
+                # The branch is unchanged. Its merge base only changes if part of its stack landed
+                base = self.previous.bases.get(name)
+                if base is not None:
+                    bases[name] = self.landed_base(nodes, sha, base, landed)
+                if self.is_landed(name, sha, landed):
+                    self.landed_branches.append(name)
+                continue
+
+            # New, moved or rewritten branches are the only ones we query
+            base = bases[name] if name in bases else self.merge_base(sha)
+            if base is None:
+                continue
+            bases[name] = base
+            if self.is_landed(name, sha, landed):
+                self.landed_branches.append(name)
+            self.add_stack(nodes, base, sha)
+
+        self.landed_commits = [sha for sha in self.previous.nodes if sha in landed]
+        self.deleted_branches = sorted(name for name in self.previous.refs if name not in refs)
+
+        old_bases = set(self.previous.bases.values())
+        for name, base in bases.items():
+            if base not in old_bases and name not in self.landed_branches:
+                self.new_bases[name] = base
+
+        nodes = self.prune(nodes, refs, landed)
+        return TreeSnapshot(self.main_name, self.new_main_sha, refs, bases, nodes)
+
+    def is_landed(self, name, sha, landed):
+        """
+        A branch landed if its previous tip was a local commit and either that tip or its new one reached the main ref.
+        New branches and branches that were already on the main ref (e.g. a fast forwarded master) never land.
+        """
+        old_sha = self.previous.refs.get(name)
+        if old_sha is None or old_sha not in self.previous.nodes:
+            return False
+        return old_sha in landed or sha in landed
+
+    def landed_below(self, sha, base):
+        """
+        Walks a previous stack from its tip and returns `base` and every local commit below it,
+        which are the commits of the stack that reached the main ref. Returns an empty list if base is not in the stack.
+        """
+        found = []
+        while sha in self.previous.nodes:
+            if sha == base or len(found) > 0:
+                found.append(sha)
+            sha = self.previous.nodes[sha]
+        return found
+
+    def merge_base(self, sha):
+        b = self.repo.merge_base(sha, self.new_main_sha)
+        return b[0].hexsha if len(b) == 1 else None
+
+    def landed_base(self, nodes, sha, base, landed):
+        """
+        Walks a branch stack from its tip down to its base and returns the first landed commit,
+        which is the new merge base of the branch. Returns the old base if nothing landed.
+        """
+        while sha != base and sha in nodes:
+            if sha in landed:
+                return sha
+            sha = nodes[sha]
+        return base
+
+    def add_stack(self, nodes, base, sha):
+        """
+        Adds the commits between a merge base and a branch tip to the nodes map
+        """
+        if base == sha:
+            return
+        revs = "{}..{}".format(base, sha)
+        for line in self.repo.git.rev_list(revs, parents=True, first_parent=True).splitlines():
+            shas = line.split()
+            if len(shas) > 1:
+                nodes[shas[0]] = shas[1]
+
+    def prune(self, nodes, refs, landed):
+        """
+        Returns the nodes still reachable from a branch, excluding the commits that landed on the main ref
+        """
+        kept = {}
+        for sha in refs.values():
+            while sha in nodes and sha not in kept and sha not in landed:
+                kept[sha] = nodes[sha]
+                sha = nodes[sha]
+        return kept
+
+
+def find_base(nodes, sha):
+    """
+    Walks the nodes map from a commit down to the first commit that is not a local node, which is its merge base
+    """
+    while sha in nodes:
+        sha = nodes[sha]
+    return sha
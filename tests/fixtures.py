@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+Helpers to build fixture repositories for the tests
+"""
+import os
+import subprocess as sp
+
+GIT_ENV = {
+    "GIT_AUTHOR_NAME": "Test",
+    "GIT_AUTHOR_EMAIL": "test@example.com",
+    "GIT_COMMITTER_NAME": "Test",
+    "GIT_COMMITTER_EMAIL": "test@example.com",
+}
+
+
+def run_git(cwd, *args, **extra_env):
+    """
+    Runs a git command in a directory. Extra keyword arguments are added to the environment (e.g. commit dates)
+    """
+    env = dict(os.environ)
+    env.update(GIT_ENV)
+    env.update(extra_env)
+    return sp.run(["git"] + list(args), cwd=cwd, env=env, check=True, stdout=sp.PIPE, stderr=sp.DEVNULL).stdout.decode().strip()
+
+
+def make_clone(path, main_commits):
+    """
+    Creates an origin repo with `main_commits` commits on master and returns the path of a clone of it
+    """
+    origin = os.path.join(path, "origin")
+    work = os.path.join(path, "work")
+    os.makedirs(origin)
+    run_git(origin, "init", "-q", "-b", "master")
+    for i in range(main_commits):
+        run_git(origin, "commit", "-q", "--allow-empty", "-m", "main {}".format(i))
+    run_git(path, "clone", "-q", origin, work)
+    return work
+
+
+def make_branch(cwd, name, start, commits, **extra_env):
+    """
+    Creates a branch at `start` with `commits` new commits on it and returns their shas, oldest first
+    """
+    run_git(cwd, "checkout", "-q", "-b", name, start)
+    shas = []
+    for i in range(commits):
+        run_git(cwd, "commit", "-q", "--allow-empty", "-m", "{} commit {}".format(name, i), **extra_env)
+        shas.append(run_git(cwd, "rev-parse", "HEAD"))
+    return shas
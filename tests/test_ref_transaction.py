@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+import shutil
+import tempfile
+import unittest
+
+from git import Repo
+from shared.utils import RefTransaction
+from tests.fixtures import run_git, make_clone, make_branch
+
+
+class RefTransactionTest(unittest.TestCase):
+    """
+    Every test starts from a clone with branches `a` (1 commit) and `b` (2 commits) on origin/master
+    """
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+        self.path = make_clone(self.tmpdir, 1)
+        self.a = make_branch(self.path, "a", "origin/master", 1)
+        self.b = make_branch(self.path, "b", "origin/master", 2)
+        self.repo = Repo(self.path)
+        self.addCleanup(self.repo.close)
+
+    def branches(self):
+        return {head.name: head.commit.hexsha for head in self.repo.heads}
+
+    def test_commit_applies_all_updates(self):
+        transaction = RefTransaction(self.repo)
+        transaction.update_head(self.repo.heads.a, self.repo.commit(self.b[1]))
+        transaction.create_head("c", self.repo.commit(self.a[0]))
+        transaction.delete_head(self.repo.heads.master)
+        transaction.commit()
+
+        self.assertEqual(self.branches(), {"a": self.b[1], "b": self.b[1], "c": self.a[0]})
+
+    def test_describe_uses_short_shas(self):
+        transaction = RefTransaction(self.repo)
+        transaction.update_head(self.repo.heads.a, self.repo.commit(self.b[1]))
+        transaction.create_head("c", self.repo.commit(self.a[0]))
+        transaction.delete_head(self.repo.heads.master)
+
+        short_b = run_git(self.path, "rev-parse", "--short", self.b[1])
+        short_a = run_git(self.path, "rev-parse", "--short", self.a[0])
+        self.assertEqual(transaction.describe(), [
+            "Update a to {}".format(short_b),
+            "Create c at {}".format(short_a),
+            "Delete master",
+        ])
+
+    def test_moved_ref_fails_whole_transaction(self):
+        before = self.branches()
+        transaction = RefTransaction(self.repo)
+        transaction.create_head("c", self.repo.commit(self.a[0]))
+        transaction.update_head(self.repo.heads.a, self.repo.commit(self.b[1]))
+        transaction.delete_head(self.repo.heads.master)
+
+        # b is moved between planning and commit
+        transaction.update_head(self.repo.heads.b, self.repo.commit(self.a[0]))
+        run_git(self.path, "update-ref", "refs/heads/b", self.b[0])
+        before["b"] = self.b[0]
+
+        with self.assertRaises(RuntimeError) as context:
+            transaction.commit()
+        self.assertIn("refs/heads/b", str(context.exception))
+        self.assertEqual(self.branches(), before)
+
+    def test_create_existing_branch_fails(self):
+        before = self.branches()
+        transaction = RefTransaction(self.repo)
+        transaction.update_head(self.repo.heads.a, self.repo.commit(self.b[1]))
+        transaction.create_head("b", self.repo.commit(self.a[0]))
+
+        with self.assertRaises(RuntimeError) as context:
+            transaction.commit()
+        self.assertIn("refs/heads/b", str(context.exception))
+        self.assertEqual(self.branches(), before)
+
+    def test_delete_checked_out_branch_detaches_head(self):
+        run_git(self.path, "checkout", "-q", "a")
+        transaction = RefTransaction(self.repo)
+        transaction.update_head(self.repo.heads.b, self.repo.commit(self.a[0]))
+        transaction.delete_head(self.repo.heads.a)
+        transaction.commit()
+
+        self.assertTrue(self.repo.head.is_detached)
+        self.assertEqual(self.repo.head.commit.hexsha, self.a[0])
+        self.assertNotIn("a", self.branches())
+        self.assertEqual(self.branches()["b"], self.a[0])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+Scaling regression tests.
+They build fixture repositories of growing size and count the git processes started through GitPython,
+so per-branch or per-node git calls in the shared utils and in Smartlog can't come back unnoticed.
+"""
+import contextlib
+import io
+import os
+import shutil
+import tempfile
+import unittest
+from collections import Counter
+
+import git
+from git import Repo
+from shared.utils import get_child_heads
+from smartlog.smartlog import Smartlog
+from smartlog.printer import TreePrinter, NodePrinter, RefList
+from smartlog.prefetch import CommitPrefetcher
+from tests.fixtures import make_clone, make_branch
+
+# Fixture sizes as (number of branches, commits per branch)
+SIZES = [(4, 1), (16, 2), (48, 3)]
+
+
+def make_fixture(path, branches, depth):
+    """
+    Creates an origin repo with one main commit per branch and a clone in which every branch stacks `depth`
+    commits on a main commit. Branches are paired on their main commit (branch i starts at origin/master~(i // 2)),
+    so the number of distinct merge bases still grows with the number of branches.
+    Returns the path of the clone.
+    """
+    work = make_clone(path, branches)
+    for i in range(branches):
+        make_branch(work, "branch{}".format(i), "origin/master~{}".format(i // 2), depth)
+    return work
+
+
+class GitCallCounter:
+    """
+    Context manager counting the git processes started through GitPython, by git sub command
+    """
+    def __init__(self):
+        self.calls = Counter()
+
+    def __enter__(self):
+        self.execute = git.cmd.Git.execute
+        counter = self
+
+        def execute(git_cmd, command, *args, **kwargs):
+            counter.calls[command[1] if isinstance(command, (list, tuple)) else command] += 1
+            return counter.execute(git_cmd, command, *args, **kwargs)
+
+        git.cmd.Git.execute = execute
+        return self
+
+    def __exit__(self, *exc):
+        git.cmd.Git.execute = self.execute
+
+    def total(self):
+        return sum(self.calls.values())
+
+
+class ScalingTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.tmpdir = tempfile.mkdtemp()
+        cls.fixtures = []
+        for branches, depth in SIZES:
+            path = os.path.join(cls.tmpdir, "{}x{}".format(branches, depth))
+            cls.fixtures.append((branches, depth, make_fixture(path, branches, depth)))
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.tmpdir)
+
+    def open_repo(self, path):
+        # Each measurement gets a fresh Repo so persistent cat-file processes are counted the same way every time
+        repo = Repo(path)
+        self.addCleanup(repo.close)
+        return repo
+
+    def build_smartlog(self, repo):
+        smartlog = Smartlog(repo, repo.refs["origin/master"])
+        smartlog.add_commits([head.commit for head in repo.heads] + [repo.head.commit])
+        return smartlog
+
+    def assertConstant(self, counts):
+        """
+        Asserts that every fixture size used exactly the same git calls
+        """
+        for size, calls in counts[1:]:
+            self.assertEqual(calls, counts[0][1], "git calls changed with size {}: {}".format(size, counts))
+
+    def test_get_child_heads_runs_a_single_git_call(self):
+        counts = []
+        for branches, depth, path in self.fixtures:
+            repo = self.open_repo(path)
+            commit = repo.commit("origin/master~{}".format(branches // 4))
+            with GitCallCounter() as counter:
+                heads = get_child_heads(repo, commit)
+            self.assertGreater(len(heads), 0)
+            self.assertEqual(counter.calls, Counter({"for-each-ref": 1}))
+            counts.append(((branches, depth), counter.calls))
+        self.assertConstant(counts)
+
+    def test_smartlog_construction_is_constant(self):
+        counts = []
+        for branches, depth, path in self.fixtures:
+            repo = self.open_repo(path)
+            with GitCallCounter() as counter:
+                smartlog = self.build_smartlog(repo)
+            # One rev-list for the merge bases, one merge-base and one rev-list to order them on the main ref
+            self.assertEqual(counter.calls["merge-base"], 1)
+            self.assertEqual(counter.calls["rev-list"], 2)
+            self.assertLessEqual(counter.total(), 5)
+            counts.append(((branches, depth), counter.calls))
+        self.assertConstant(counts)
+
+    def test_add_lca_keeps_main_ref_order(self):
+        branches, depth, path = self.fixtures[-1]
+        repo = self.open_repo(path)
+        smartlog = self.build_smartlog(repo)
+
+        # Walk the main chain from the oldest merge base up to the main ref
+        chain = []
+        main_children = smartlog.root_node.children
+        while len(main_children) > 0:
+            node = main_children[0]
+            chain.append(node.commit.hexsha)
+            main_children = [child for child in node.children if child.is_main]
+
+        first_parents = repo.git.rev_list("origin/master", first_parent=True).split()
+        expected = [sha for sha in reversed(first_parents) if sha in set(chain)]
+        self.assertEqual(chain, expected)
+        self.assertEqual(len(chain), (branches - 1) // 2 + 1)
+
+    def test_printer_is_constant(self):
+        counts = []
+        for branches, depth, path in self.fixtures:
+            repo = self.open_repo(path)
+            smartlog = self.build_smartlog(repo)
+            main_ref = repo.refs["origin/master"]
+            with GitCallCounter() as counter:
+                reflist = RefList(repo, extra_refs=[main_ref])
+                printer = TreePrinter(repo, smartlog.root_node, main_ref, NodePrinter(repo, reflist))
+                with contextlib.redirect_stdout(io.StringIO()):
+                    printer.print_tree()
+            # One batched log call for all the short shas
+            self.assertEqual(counter.calls, Counter({"log": 1}))
+            counts.append(((branches, depth), counter.calls))
+        self.assertConstant(counts)
+
+    def test_prefetch_is_constant(self):
+        counts = []
+        for branches, depth, path in self.fixtures:
+            repo = self.open_repo(path)
+            main_ref = repo.refs["origin/master"]
+            with GitCallCounter() as counter:
+                prefetcher = CommitPrefetcher(repo)
+                try:
+                    smartlog = Smartlog(repo, main_ref, prefetcher=prefetcher)
+                    smartlog.add_commits([head.commit for head in repo.heads] + [repo.head.commit])
+                    printer = TreePrinter(repo, smartlog.root_node, main_ref, NodePrinter(repo, RefList(repo), prefetcher=prefetcher))
+                    with contextlib.redirect_stdout(io.StringIO()):
+                        printer.print_tree()
+                finally:
+                    prefetcher.close()
+            # The worker resolves every short sha with one log call and never fails over to per node lookups
+            self.assertFalse(prefetcher.failed)
+            self.assertEqual(counter.calls["log"], 1)
+            self.assertEqual(counter.calls["rev-parse"], 0)
+            counts.append(((branches, depth), counter.calls))
+        self.assertConstant(counts)
+
+
+if __name__ == "__main__":
+    unittest.main()
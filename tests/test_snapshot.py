@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+import shutil
+import tempfile
+import unittest
+
+from git import Repo
+from smartlog.smartlog import Smartlog
+from smartlog.snapshot import TreeSnapshot, TreeDiff, snapshot_path
+from tests.fixtures import run_git, make_clone, make_branch
+
+MAX_AGE = 14 * 24 * 3600
+
+
+class SnapshotTest(unittest.TestCase):
+    """
+    Every test starts from a clone with two main commits and:
+    - branch `a` with 2 commits on the first main commit
+    - branch `b` with 1 commit on origin/master
+    A snapshot of that tree is stored, then the test changes the repo and diffs against the snapshot.
+    """
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+        self.path = make_clone(self.tmpdir, 2)
+        self.main_shas = [run_git(self.path, "rev-parse", "origin/master~1"), run_git(self.path, "rev-parse", "origin/master")]
+        self.a = make_branch(self.path, "a", "origin/master~1", 2)
+        self.b = make_branch(self.path, "b", "origin/master", 1)
+
+    def open_repo(self):
+        repo = Repo(self.path)
+        self.addCleanup(repo.close)
+        return repo
+
+    def save_snapshot(self, max_age=None):
+        repo = self.open_repo()
+        smartlog = Smartlog(repo, repo.refs["origin/master"], max_age=max_age)
+        smartlog.add_commits([head.commit for head in repo.heads] + [repo.head.commit])
+        TreeSnapshot.from_smartlog(smartlog).save(snapshot_path(repo))
+        return TreeSnapshot.load(snapshot_path(repo))
+
+    def diff(self):
+        repo = self.open_repo()
+        return TreeDiff(repo, TreeSnapshot.load(snapshot_path(repo)), repo.refs["origin/master"])
+
+    def test_snapshot_content(self):
+        snapshot = self.save_snapshot()
+        self.assertEqual(snapshot.main_name, "origin/master")
+        self.assertEqual(snapshot.main_sha, self.main_shas[1])
+        self.assertEqual(snapshot.refs, {"a": self.a[1], "b": self.b[0], "master": self.main_shas[1]})
+        self.assertEqual(snapshot.bases, {"a": self.main_shas[0], "b": self.main_shas[1], "master": self.main_shas[1]})
+        self.assertEqual(snapshot.nodes, {self.a[1]: self.a[0], self.a[0]: self.main_shas[0], self.b[0]: self.main_shas[1]})
+
+    def test_no_changes(self):
+        self.save_snapshot()
+        diff = self.diff()
+        self.assertTrue(diff.is_empty())
+        self.assertEqual(diff.snapshot.nodes, diff.previous.nodes)
+
+    def test_fast_forward_landing(self):
+        self.save_snapshot()
+        run_git(self.path, "update-ref", "refs/remotes/origin/master", self.b[0])
+
+        diff = self.diff()
+        self.assertFalse(diff.rewritten)
+        self.assertEqual(diff.landed_branches, ["b"])
+        self.assertEqual(diff.landed_commits, [self.b[0]])
+        self.assertEqual(diff.moved_branches, [])
+        self.assertEqual(diff.new_bases, {})
+        self.assertEqual(diff.snapshot.main_sha, self.b[0])
+        self.assertEqual(diff.snapshot.bases["b"], self.b[0])
+        self.assertNotIn(self.b[0], diff.snapshot.nodes)
+
+    def test_moved_branch(self):
+        self.save_snapshot()
+        run_git(self.path, "checkout", "-q", "b")
+        run_git(self.path, "commit", "-q", "--allow-empty", "-m", "b commit 1")
+        new_sha = run_git(self.path, "rev-parse", "HEAD")
+
+        diff = self.diff()
+        self.assertEqual(diff.moved_branches, [("b", self.b[0], new_sha)])
+        self.assertEqual(diff.landed_branches, [])
+        self.assertEqual(diff.new_bases, {})
+        self.assertEqual(diff.snapshot.refs["b"], new_sha)
+        self.assertEqual(diff.snapshot.nodes[new_sha], self.b[0])
+        self.assertEqual(diff.snapshot.bases["b"], self.main_shas[1])
+
+    def test_added_branch(self):
+        self.save_snapshot()
+        c = make_branch(self.path, "c", "origin/master", 1)
+        run_git(self.path, "branch", "d", "origin/master")
+
+        diff = self.diff()
+        self.assertEqual(diff.added_branches, ["c", "d"])
+        # A new branch pointing at origin/master did not land
+        self.assertEqual(diff.landed_branches, [])
+        self.assertEqual(diff.snapshot.bases["c"], self.main_shas[1])
+        self.assertEqual(diff.snapshot.bases["d"], self.main_shas[1])
+        self.assertEqual(diff.snapshot.nodes[c[0]], self.main_shas[1])
+
+    def test_deleted_branch(self):
+        self.save_snapshot()
+        run_git(self.path, "checkout", "-q", "master")
+        run_git(self.path, "branch", "-q", "-D", "a")
+
+        diff = self.diff()
+        self.assertEqual(diff.deleted_branches, ["a"])
+        self.assertNotIn("a", diff.snapshot.refs)
+        self.assertNotIn("a", diff.snapshot.bases)
+        self.assertNotIn(self.a[0], diff.snapshot.nodes)
+        self.assertNotIn(self.a[1], diff.snapshot.nodes)
+
+    def test_rewritten_main(self):
+        self.save_snapshot()
+        # origin/master is force moved onto branch a, which does not contain the previous origin/master
+        run_git(self.path, "update-ref", "refs/remotes/origin/master", self.a[1])
+
+        diff = self.diff()
+        self.assertTrue(diff.rewritten)
+        self.assertEqual(diff.landed_branches, ["a"])
+        self.assertEqual(sorted(diff.landed_commits), sorted(self.a))
+        # b now sits on the first main commit, which already was the merge base of a
+        self.assertEqual(diff.snapshot.bases["b"], self.main_shas[0])
+        self.assertEqual(diff.new_bases, {})
+        self.assertEqual(diff.snapshot.bases["a"], self.a[1])
+        self.assertNotIn(self.a[0], diff.snapshot.nodes)
+        self.assertNotIn(self.a[1], diff.snapshot.nodes)
+
+    def test_snapshot_under_max_age(self):
+        old = make_branch(self.path, "old", "origin/master~1", 1, GIT_COMMITTER_DATE="2000-01-01T00:00:00")
+        snapshot = self.save_snapshot(max_age=MAX_AGE)
+        # Branches older than the max age are tracked, but are not part of the tree
+        self.assertEqual(snapshot.refs["old"], old[0])
+        self.assertNotIn("old", snapshot.bases)
+        self.assertNotIn(old[0], snapshot.nodes)
+
+        run_git(self.path, "checkout", "-q", "old")
+        run_git(self.path, "commit", "-q", "--allow-empty", "-m", "old commit 1")
+        new_sha = run_git(self.path, "rev-parse", "HEAD")
+
+        diff = self.diff()
+        self.assertEqual(diff.moved_branches, [("old", old[0], new_sha)])
+        self.assertEqual(diff.snapshot.bases["old"], self.main_shas[0])
+        self.assertEqual(diff.snapshot.nodes[new_sha], old[0])
+        self.assertEqual(diff.snapshot.nodes[old[0]], self.main_shas[0])
+
+
+if __name__ == "__main__":
+    unittest.main()